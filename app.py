@@ -1,219 +1,791 @@
-import os
-import shutil
-import subprocess
-import tempfile
-import json
-import urllib.request
-import urllib.error
-from flask import Flask, request, Response, jsonify
-
-app = Flask(__name__)
-
-def get_repo_size(repo_url):
-    """Get the size of a GitHub repository in MB using GitHub API."""
-    # Extract owner and repo name from URL
-    parts = repo_url.rstrip('/').split('/')
-    if len(parts) < 5 or parts[2] != 'github.com':
-        return None, "Invalid GitHub URL format"
-    
-    owner = parts[3]
-    repo = parts[4].split('.')[0]  # Remove .git extension if present
-    
-    # Handle tree or blob paths
-    if '/tree/' in repo or '/blob/' in repo:
-        repo = repo.split('/')[0]
-    
-    # Use GitHub API to get repo information
-    api_url = f"https://api.github.com/repos/{owner}/{repo}"
-    try:
-        # Using urllib from standard library instead of requests
-        headers = {'User-Agent': 'Repository-Size-Checker/1.0'}
-        req = urllib.request.Request(api_url, headers=headers)
-        with urllib.request.urlopen(req) as response:
-            data = json.loads(response.read().decode('utf-8'))
-            # Size is returned in KB, convert to MB
-            size_mb = data.get('size', 0) / 1024
-            return size_mb, None
-    except urllib.error.HTTPError as e:
-        return None, f"GitHub API error: {e.code} {e.reason}"
-    except urllib.error.URLError as e:
-        return None, f"Connection error: {e.reason}"
-    except Exception as e:
-        return None, f"Error fetching repository size: {str(e)}"
-
-def clone_repo(repo_url, clone_dir):
-    """Clone the GitHub repository into the specified directory."""
-    repo_url = repo_url.split("/tree/")[0]  # Ensure the URL does not contain '/tree/main'
-    subprocess.run(["git", "clone", repo_url, clone_dir], check=True)
-
-def extract_repo_name_from_url(repo_url):
-    """Extract the repository name from the GitHub URL, handling '/tree/main' and similar cases."""
-    repo_url = repo_url.split("/tree/")[0]  # Remove anything after '/tree/'
-    repo_url = repo_url.split("/blob/")[0]  # Also handle '/blob/main' if needed
-    repo_name = repo_url.rstrip("/").split("/")[-1]
-    return repo_name.split(".")[0] if "." in repo_name else repo_name
-
-def get_directory_structure(root_dir):
-    """Get the directory structure in a tree format, ignoring .git directory."""
-    lines = []
-    for root, dirs, files in os.walk(root_dir):
-        if ".git" in dirs:
-            dirs.remove(".git")  # Avoid walking into .git directory
-
-        level = root.replace(root_dir, "").count(os.sep)
-        indent = " " * 4 * level
-        lines.append(f"{indent}├── {os.path.basename(root)}/")
-
-        subindent = " " * 4 * (level + 1)
-        for file in files:
-            lines.append(f"{subindent}├── {file}")
-    return "\n".join(lines)
-
-def read_file_contents(file_path):
-    """Read the contents of a file, ignore if in .git directory."""
-    if ".git" in file_path:
-        return "[Ignored .git directory]"
-
-    try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            return file.read()
-    except (UnicodeDecodeError, OSError) as e:
-        return f"[Error reading file: {e}]"
-
-def extract_all_files_contents(root_dir):
-    """Extract contents of all files in the directory, ignoring .git directory."""
-    file_contents = {}
-    for root, _, files in os.walk(root_dir):
-        if ".git" in root:
-            continue
-        for file_name in files:
-            file_path = os.path.join(root, file_name)
-            relative_path = os.path.relpath(file_path, root_dir)
-            file_contents[relative_path] = read_file_contents(file_path)
-    return file_contents
-
-def generate_repo_analysis(repo_url):
-    """Generate repository analysis and return as a string."""
-    # Check repository size before cloning
-    repo_size, size_error = get_repo_size(repo_url)
-    
-    if size_error:
-        return None, size_error
-    
-    # Check if repository is too large (over 100MB)
-    if repo_size > 100:
-        return None, f"Repository size ({repo_size:.2f} MB) exceeds the 100 MB limit"
-    
-    # Create a temporary directory for cloning
-    with tempfile.TemporaryDirectory() as temp_dir:
-        try:
-            repo_name = extract_repo_name_from_url(repo_url)
-            clone_dir = os.path.join(temp_dir, repo_name)
-            
-            # Clone the repository
-            clone_repo(repo_url, clone_dir)
-            
-            # Get directory structure and file contents
-            directory_structure = get_directory_structure(clone_dir)
-            file_contents = extract_all_files_contents(clone_dir)
-            
-            # Count total lines and characters
-            total_lines = directory_structure.count("\n") + sum(
-                content.count("\n") for content in file_contents.values()
-            )
-            total_chars = len(directory_structure) + sum(
-                len(content) for content in file_contents.values()
-            )
-            
-            # Generate the output text with the repository size
-            output_text = f"Repository Size: {repo_size:.2f} MB\n"
-            output_text += f"Lines: {total_lines}\nCharacters: {total_chars}\n\n"
-            output_text += "Directory Structure:\n```\n"
-            output_text += directory_structure
-            output_text += "\n```\n"
-            
-            for file_path, content in file_contents.items():
-                output_text += f"\nContents of {file_path}:\n```\n"
-                output_text += content
-                output_text += "\n```\n"
-                
-            return output_text, None
-        
-        except Exception as e:
-            return None, str(e)
-
-@app.route('/analyze', methods=['GET', 'POST'])
-def analyze_repo():
-    """Endpoint to analyze a GitHub repository from a URL."""
-    if request.method == 'POST':
-        # Get URL from POST request
-        data = request.get_json()
-        if not data or 'repo_url' not in data:
-            response = jsonify({'error': 'Missing repo_url parameter'})
-            response.headers.add("Access-Control-Allow-Origin", "*")
-            return response, 400
-        repo_url = data['repo_url']
-    else:
-        # Get URL from query parameter
-        repo_url = request.args.get('repo_url')
-        if not repo_url:
-            response = jsonify({'error': 'Missing repo_url parameter'})
-            response.headers.add("Access-Control-Allow-Origin", "*")
-            return response, 400
-
-    # Validate the URL (basic check)
-    if not repo_url.startswith('https://github.com/'):
-        response = jsonify({'error': 'Invalid GitHub URL'})
-        response.headers.add("Access-Control-Allow-Origin", "*")
-        return response, 400
-
-    # First check the repository size
-    repo_size, size_error = get_repo_size(repo_url)
-    
-    if size_error:
-        response = jsonify({'error': size_error})
-        response.headers.add("Access-Control-Allow-Origin", "*")
-        return response, 400
-    
-    # Check if repository is too large
-    if repo_size > 100:
-        response = jsonify({
-            'error': f"Repository size ({repo_size:.2f} MB) exceeds the 100 MB limit",
-            'repo_size': repo_size
-        })
-        response.headers.add("Access-Control-Allow-Origin", "*")
-        return response, 413  # 413 Payload Too Large
-
-    # Generate the repository analysis
-    output_text, error = generate_repo_analysis(repo_url)
-
-    if error:
-        response = jsonify({'error': f'Error analyzing repository: {error}'})
-        response.headers.add("Access-Control-Allow-Origin", "*")
-        return response, 500
-
-    # Determine if the client wants a download or JSON response
-    download = request.args.get('download', 'false').lower() == 'true'
-
-    if download:
-        # Return as a downloadable file
-        repo_name = extract_repo_name_from_url(repo_url)
-        response = Response(
-            output_text,
-            mimetype='text/plain',
-            headers={'Content-Disposition': f'attachment; filename={repo_name}_analysis.txt'}
-        )
-    else:
-        # Return JSON response with the text content and repo size
-        response = jsonify({
-            'content': output_text,
-            'repo_size': repo_size
-        })
-
-    response.headers.add("Access-Control-Allow-Origin", "*")
-    return response
-
-
-if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+import asyncio
+import fcntl
+import functools
+import hashlib
+import io
+import os
+import re
+import shutil
+import subprocess
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+import aiofiles
+import httpx
+from quart import Quart, request, Response, jsonify, send_file
+
+app = Quart(__name__)
+
+# How many file reads to keep in flight at once while streaming contents
+READ_BATCH_SIZE = 32
+
+# How many repositories a batch request fetches at once
+BATCH_CONCURRENCY = 8
+
+# Files whose contents are never worth inlining as text
+BINARY_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.ico', '.pdf', '.zip', '.tar', '.gz',
+    '.bz2', '.xz', '.7z', '.woff', '.woff2', '.ttf', '.eot', '.so', '.dll',
+    '.dylib', '.exe', '.bin', '.class', '.jar', '.wasm', '.pyc', '.o', '.a',
+    '.mp3', '.mp4', '.webm', '.avi', '.mov',
+}
+
+# Largest file whose contents are inlined in the analysis
+MAX_TEXT_FILE_SIZE = 1 << 20
+
+# On-disk cache of generated analyses, keyed by (repo_url, HEAD SHA).
+# A new commit yields a new SHA, so invalidation is automatic.
+CACHE_ROOT = os.environ.get("GITTRACE_CACHE_DIR", os.path.expanduser("~/.cache/gittrace"))
+ANALYSIS_CACHE_DIR = os.path.join(CACHE_ROOT, "analyses")
+ANALYSIS_CACHE_TTL = 86400  # seconds
+ANALYSIS_CACHE_MAX_ENTRIES = 128
+
+# When set (e.g. "/internal"), cache-hit downloads are answered with an
+# X-Accel-Redirect so nginx streams the file itself with zero-copy
+# sendfile; the matching nginx config is
+#   location /internal/ { internal; alias <GITTRACE_CACHE_DIR>/analyses/; }
+ACCEL_REDIRECT_PREFIX = os.environ.get("GITTRACE_ACCEL_PREFIX")
+
+# Persistent bare mirrors, one per repository, reused across requests
+MIRROR_CACHE_DIR = os.path.join(CACHE_ROOT, "mirrors")
+MIRROR_CACHE_MAX_ENTRIES = 64
+# Never evict a mirror fetched this recently: another worker may still
+# be streaming blobs out of it
+MIRROR_EVICT_GRACE = 3600  # seconds
+
+# Serializes clone/fetch per mirror so concurrent requests don't race git
+_mirror_locks = {}
+
+# Directory teardown runs here so no request ever waits on an rmtree
+_gc_executor = ThreadPoolExecutor(max_workers=2)
+
+# Matches a GitHub repo URL, capturing owner and repo while dropping an
+# optional .git suffix and any trailing /tree/..., query or fragment.
+_GITHUB_URL_RE = re.compile(
+    r'^https?://github\.com/([^/?#]+)/([^/?#]+?)(?:\.git)?(?:[/?#].*)?$'
+)
+
+@functools.lru_cache(maxsize=1024)
+def parse_github_url(repo_url):
+    """Return (owner, repo) from a GitHub URL, or None if it doesn't match."""
+    match = _GITHUB_URL_RE.match(repo_url)
+    return (match.group(1), match.group(2)) if match else None
+
+# Shared HTTP client: API calls reuse pooled TCP+TLS connections instead
+# of paying a fresh handshake per request. Created lazily per worker.
+_http_client = None
+
+def get_http_client():
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            headers={'User-Agent': 'Repository-Size-Checker/1.0'},
+            timeout=10.0,
+        )
+    return _http_client
+
+# (owner, repo) -> (fetched_at, etag, size_mb); refreshed by conditional GET
+_repo_size_cache = {}
+REPO_SIZE_TTL = 60  # seconds a size is served without revalidating
+
+async def get_repo_size(repo_url):
+    """Get the size of a GitHub repository in MB using GitHub API.
+
+    Results are cached for a short TTL; after that the stored ETag is
+    revalidated with If-None-Match, so an unchanged repo costs a 304
+    with no response body.
+    """
+    parsed = parse_github_url(repo_url)
+    if parsed is None:
+        return None, "Invalid GitHub URL format"
+
+    now = time.time()
+    cached = _repo_size_cache.get(parsed)
+    if cached and now - cached[0] < REPO_SIZE_TTL:
+        return cached[2], None
+
+    owner, repo = parsed
+    api_url = f"https://api.github.com/repos/{owner}/{repo}"
+    headers = {}
+    if cached and cached[1]:
+        headers['If-None-Match'] = cached[1]
+    try:
+        response = await get_http_client().get(api_url, headers=headers)
+        if response.status_code == 304 and cached:
+            _repo_size_cache[parsed] = (now, cached[1], cached[2])
+            return cached[2], None
+        if response.status_code != 200:
+            return None, f"GitHub API error: {response.status_code} {response.reason_phrase}"
+        # Size is returned in KB, convert to MB
+        size_mb = response.json().get('size', 0) / 1024
+        _repo_size_cache[parsed] = (now, response.headers.get('ETag'), size_mb)
+        return size_mb, None
+    except httpx.HTTPError as e:
+        return None, f"Connection error: {e}"
+    except Exception as e:
+        return None, f"Error fetching repository size: {str(e)}"
+
+async def run_git(*args, cwd=None):
+    """Run a git command, raising CalledProcessError with stderr on failure."""
+    proc = await asyncio.create_subprocess_exec(
+        "git", *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+        # Fail fast instead of hanging on a credential prompt for private repos
+        env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+    )
+    stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(
+            proc.returncode, ["git", *args],
+            stderr=stderr.decode("utf-8", "replace"),
+        )
+    return stdout
+
+def mirror_path(repo_url):
+    """Location of the persistent bare mirror for this repository."""
+    parsed = parse_github_url(repo_url)
+    if parsed:
+        owner, repo = parsed
+    else:
+        parts = repo_url.split("/tree/")[0].rstrip("/").split("/")
+        owner = parts[3] if len(parts) > 3 else "unknown"
+        repo = extract_repo_name_from_url(repo_url)
+    return os.path.join(MIRROR_CACHE_DIR, f"{owner}__{repo}.git")
+
+async def fetch_mirror(repo_url):
+    """Create or refresh the bare mirror for repo_url; return its path.
+
+    The mirror is shallow: only the tip is ever read, so history, tags
+    and extra branches are skipped, and history operations (git log,
+    bisect) won't work on it. The tip blobs are fetched eagerly so
+    cat-file can serve them locally. Repeat requests fetch just the new
+    tip instead of re-downloading every object.
+    """
+    repo_url = repo_url.split("/tree/")[0]  # Ensure the URL does not contain '/tree/main'
+    mirror = mirror_path(repo_url)
+    lock = _mirror_locks.setdefault(mirror, asyncio.Lock())
+    async with lock:
+        os.makedirs(MIRROR_CACHE_DIR, exist_ok=True)
+        # The asyncio lock only covers this process; the mirror directory
+        # is shared by every worker, so clone/fetch also takes an
+        # advisory flock on a lockfile next to the mirror. Without it,
+        # two workers cold-cloning the same repo race into the same path
+        # and the loser fails with "destination path already exists".
+        lock_fd = os.open(f"{mirror}.lock", os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            await asyncio.to_thread(fcntl.flock, lock_fd, fcntl.LOCK_EX)
+            if not os.path.isdir(mirror):
+                await run_git(
+                    "clone", "--bare",
+                    "--depth", "1",
+                    "--single-branch",
+                    "--no-tags",
+                    repo_url, mirror,
+                )
+            # Refresh FETCH_HEAD to the current remote tip (a no-op right
+            # after the initial clone, one small fetch on later requests)
+            try:
+                await run_git(
+                    "fetch", "--depth", "1", "--no-tags",
+                    "origin", "HEAD", cwd=mirror,
+                )
+            except subprocess.CalledProcessError as e:
+                # A just-created repository has no commits, so HEAD is an
+                # unborn ref; the mirror is valid but has nothing to fetch
+                # and list_tree yields an empty listing.
+                if "couldn't find remote ref" not in (e.stderr or ""):
+                    raise
+            # Mark recency for the LRU cull, then drop the oldest mirrors
+            os.utime(mirror)
+            cull_mirrors()
+        finally:
+            os.close(lock_fd)  # also releases the flock
+    return mirror
+
+def discard_tree(path):
+    """Move a directory aside atomically and delete it in the background.
+
+    The rename is instant on the same filesystem, so whatever triggered
+    the teardown never waits for the per-file unlink churn; a crash
+    mid-delete just leaves a .trash entry for the startup sweep.
+    """
+    trash = f"{path}.trash.{uuid4().hex}"
+    try:
+        os.rename(path, trash)
+    except OSError:
+        return
+    _gc_executor.submit(shutil.rmtree, trash, ignore_errors=True)
+
+def cull_mirrors():
+    """Discard the least recently fetched mirrors beyond the entry limit.
+
+    Mirrors touched within the grace window are left alone even when
+    over the limit: reads happen after the fetch lock is released, and
+    another worker's in-flight stream must not have its objects pulled
+    out from under it.
+    """
+    try:
+        listing = list(os.scandir(MIRROR_CACHE_DIR))
+    except OSError:
+        return
+    entries = []
+    for entry in listing:
+        if ".trash." in entry.name:
+            continue
+        try:
+            # Stat now, not in the sort key: another worker's concurrent
+            # cull can rename an entry away between scandir and stat
+            if entry.is_dir(follow_symlinks=False):
+                entries.append((entry.stat().st_mtime, entry.path))
+        except OSError:
+            continue
+    entries.sort(reverse=True)
+    cutoff = time.time() - MIRROR_EVICT_GRACE
+    for mtime, path in entries[MIRROR_CACHE_MAX_ENTRIES:]:
+        if mtime < cutoff:
+            discard_tree(path)
+
+@app.before_serving
+async def sweep_trash():
+    """Clear trash left behind if a previous run crashed mid-delete."""
+    for parent in (MIRROR_CACHE_DIR, ANALYSIS_CACHE_DIR):
+        try:
+            entries = list(os.scandir(parent))
+        except OSError:
+            continue
+        for entry in entries:
+            if ".trash." in entry.name:
+                _gc_executor.submit(shutil.rmtree, entry.path, ignore_errors=True)
+
+async def list_tree(mirror):
+    """Enumerate (path, sha, size) for every blob in the fetched tip."""
+    fetch_head = os.path.join(mirror, "FETCH_HEAD")
+    # A failed fetch leaves FETCH_HEAD missing or zero-byte: the
+    # repository is empty and there is no tip to enumerate
+    if not os.path.exists(fetch_head) or os.path.getsize(fetch_head) == 0:
+        return []
+    output = await run_git("ls-tree", "-r", "-l", "-z", "FETCH_HEAD", cwd=mirror)
+    entries = []
+    for record in output.split(b"\0"):
+        if not record:
+            continue
+        meta, path = record.split(b"\t", 1)
+        _mode, object_type, sha, size = meta.split()
+        if object_type != b"blob":
+            continue  # submodule commits etc. have no contents to read
+        entries.append((
+            path.decode("utf-8", "surrogateescape"),
+            sha.decode("ascii"),
+            int(size) if size != b"-" else 0,
+        ))
+    return entries
+
+async def probe_repo(repo_url):
+    """Cheaply check that the repository is reachable before any git work.
+
+    One pooled HEAD request to the Git smart-HTTP endpoint rejects
+    missing, moved or private repositories in a single round trip,
+    instead of forking git and waiting for the protocol handshake to
+    fail.
+    """
+    parsed = parse_github_url(repo_url)
+    if parsed is None:
+        return False
+    owner, repo = parsed
+    probe_url = f"https://github.com/{owner}/{repo}/info/refs?service=git-upload-pack"
+    try:
+        response = await get_http_client().head(probe_url, follow_redirects=False)
+    except httpx.HTTPError:
+        return False
+    return response.status_code == 200
+
+def canonical_repo_url(repo_url):
+    """Canonical clone URL: /tree/..., /blob/..., .git and any trailing
+    query or fragment removed, so every spelling of a repo maps to one
+    URL for cloning and cache keying."""
+    parsed = parse_github_url(repo_url)
+    if parsed:
+        return f"https://github.com/{parsed[0]}/{parsed[1]}"
+    return repo_url.split("/tree/")[0].split("/blob/")[0]
+
+async def get_remote_head(repo_url):
+    """Resolve the remote HEAD commit SHA with one git ls-remote round trip."""
+    proc = await asyncio.create_subprocess_exec(
+        "git", "ls-remote", canonical_repo_url(repo_url), "HEAD",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+    )
+    stdout, _ = await proc.communicate()
+    if proc.returncode != 0 or not stdout:
+        return None
+    return stdout.split()[0].decode("ascii")
+
+def analysis_cache_path(repo_url, head_sha):
+    """Path of the cached analysis for this (repo_url, HEAD SHA) pair.
+
+    Keyed on the canonical URL so the plain and /tree/... spellings of a
+    repo share one entry.
+    """
+    key = f"{canonical_repo_url(repo_url)}\n{head_sha}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(ANALYSIS_CACHE_DIR, f"{digest}.txt")
+
+def cull_analysis_cache():
+    """Drop the oldest cached analyses beyond the entry limit."""
+    try:
+        listing = list(os.scandir(ANALYSIS_CACHE_DIR))
+    except OSError:
+        return
+    entries = []
+    for entry in listing:
+        if ".tmp." in entry.name:
+            continue
+        try:
+            if entry.is_file():
+                entries.append((entry.stat().st_mtime, entry.path))
+        except OSError:
+            continue  # removed by another worker's cull
+    entries.sort(reverse=True)
+    for _mtime, path in entries[ANALYSIS_CACHE_MAX_ENTRIES:]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+async def locate_analysis_cache(repo_url):
+    """Return (cache_path, hit) for repo_url's current HEAD.
+
+    cache_path is the slot an analysis lives (or will live) in, or None
+    if the remote HEAD can't be resolved; hit says whether a fresh entry
+    is already there.
+    """
+    head_sha = await get_remote_head(repo_url)
+    if head_sha is None:
+        return None, False
+    cache_path = analysis_cache_path(repo_url, head_sha)
+    if os.path.exists(cache_path):
+        if time.time() - os.path.getmtime(cache_path) < ANALYSIS_CACHE_TTL:
+            return cache_path, True
+    return cache_path, False
+
+async def stream_cached_analysis(cache_path):
+    """Stream a previously generated analysis straight from the cache file."""
+    async with aiofiles.open(cache_path, "rb") as file:
+        while chunk := await file.read(1 << 20):
+            yield chunk
+
+async def stream_and_cache(stream, cache_path, read_errors):
+    """Pass chunks through while teeing them into the analysis cache.
+
+    The cache file is written under a temporary name and renamed into
+    place only once the stream completes, so aborted requests never
+    leave partial entries behind. read_errors is filled by the stream as
+    it runs; if any blob failed to read, the output is degraded (not a
+    faithful analysis of this HEAD) and must not be cached, or the
+    error placeholders would be served for the full TTL.
+    """
+    os.makedirs(ANALYSIS_CACHE_DIR, exist_ok=True)
+    # Unique per stream: two concurrent misses for the same repo must
+    # not share (and truncate) one tmp file; last replace wins
+    tmp_path = f"{cache_path}.tmp.{uuid4().hex}"
+    try:
+        async with aiofiles.open(tmp_path, "wb") as file:
+            async for chunk in stream:
+                await file.write(chunk)
+                yield chunk
+        try:
+            if read_errors:
+                os.unlink(tmp_path)
+            else:
+                os.replace(tmp_path, cache_path)
+                cull_analysis_cache()
+        except OSError:
+            pass
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def extract_repo_name_from_url(repo_url):
+    """Extract the repository name from the URL, handling '/tree/main' and similar cases."""
+    parsed = parse_github_url(repo_url)
+    if parsed:
+        # The regex keeps dots in the name: foo.bar.baz is a valid repo
+        return parsed[1]
+    # Non-GitHub URLs (e.g. file://): fall back to the last path segment
+    repo_url = repo_url.split("/tree/")[0].split("/blob/")[0]
+    repo_name = repo_url.rstrip("/").split("/")[-1]
+    return repo_name[:-4] if repo_name.endswith(".git") else repo_name
+
+# Tree rendering works in bytes so nothing is re-encoded per entry: the
+# branch glyph is encoded once here and indents are precomputed per depth
+# (deeper nesting than the table is handled by the fallback in tree_indent)
+_BRANCH = "├── ".encode("utf-8")
+_INDENTS = [b"    " * i for i in range(64)]
+
+# Flush the tree buffer to the response once it reaches this size
+_TREE_FLUSH_SIZE = 64 * 1024
+
+def tree_indent(depth):
+    """Indent bytes for a tree entry at this depth, without reallocating."""
+    if depth < len(_INDENTS):
+        return _INDENTS[depth]
+    return b"    " * depth
+
+def skip_reason(file_name, size):
+    """Placeholder bytes if this file should not be read at all, else None.
+
+    Both checks are free: the extension comes from the path and the size
+    from the ls-tree listing, so large binaries are rejected without
+    ever asking git for their contents.
+    """
+    if size > MAX_TEXT_FILE_SIZE:
+        return b"[Skipped: file larger than %d MB]" % (MAX_TEXT_FILE_SIZE // (1 << 20))
+    if os.path.splitext(file_name)[1].lower() in BINARY_EXTENSIONS:
+        return b"[Skipped binary file]"
+    return None
+
+def build_tree(entries):
+    """Nest flat ls-tree (path, sha, size) entries into a directory tree.
+
+    Each node maps a name to either a subtree dict or a (sha, size)
+    blob tuple, preserving git's sorted ordering.
+    """
+    tree = {}
+    for path, sha, size in entries:
+        node = tree
+        parts = path.split("/")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = (sha, size)
+    return tree
+
+def iter_tree(node, depth=1, prefix=""):
+    """Yield (line bytes, blob info) per tree entry, files first like the
+    filesystem walk used to, where blob info is (path, sha, size, skip
+    reason) for files and None for directories."""
+    files = [(name, value) for name, value in node.items() if not isinstance(value, dict)]
+    subdirs = [(name, value) for name, value in node.items() if isinstance(value, dict)]
+    for name, (sha, size) in files:
+        line = bytearray(tree_indent(depth))
+        line += _BRANCH
+        line += name.encode("utf-8", "surrogateescape")
+        line += b"\n"
+        yield line, (prefix + name, sha, size, skip_reason(name, size))
+    for name, subtree in subdirs:
+        line = bytearray(tree_indent(depth))
+        line += _BRANCH
+        line += name.encode("utf-8", "surrogateescape")
+        line += b"/\n"
+        yield line, None
+        yield from iter_tree(subtree, depth + 1, prefix + name + "/")
+
+async def generate_repo_analysis(repo_url, repo_size, cache_info=None):
+    """Fetch the repository and return an async generator over the analysis text.
+
+    The caller supplies repo_size (already fetched for its own size
+    check) so the GitHub API is hit once per request, not twice, and may
+    pass cache_info from locate_analysis_cache to spare a second
+    ls-remote. The
+    output is streamed chunk by chunk (tree lines, then each file's
+    contents as it is read) instead of being accumulated in one giant
+    string, so memory stays bounded by the largest single file and the
+    first bytes reach the client before the walk finishes. The
+    line/character totals are only known once everything has been read,
+    so they are emitted as a trailing summary instead of a header.
+    Returns (generator, error).
+    """
+    # Serve a cached analysis if we already generated one for this HEAD;
+    # the ls-remote round trip is all a repeat request costs.
+    if cache_info is None:
+        cache_info = await locate_analysis_cache(repo_url)
+    cache_path, cache_hit = cache_info
+    if cache_hit:
+        return stream_cached_analysis(cache_path), None
+
+    # Fetch and enumerate the tip before building the generator so
+    # failures surface as a proper error response instead of mid-stream.
+    repo_name = extract_repo_name_from_url(repo_url)
+    try:
+        mirror = await fetch_mirror(repo_url)
+        entries = await list_tree(mirror)
+    except subprocess.CalledProcessError as e:
+        # str() of CalledProcessError omits stderr, which is where git
+        # actually says what went wrong
+        detail = f": {e.stderr.strip()}" if e.stderr else ""
+        return None, f"{e}{detail}"
+    except Exception as e:
+        return None, str(e)
+
+    # Paths whose blobs failed to read; non-empty means the output is
+    # degraded and stream_and_cache must not persist it
+    read_errors = []
+
+    async def stream():
+        total_lines = 0
+        total_chars = 0
+        yield f"Repository Size: {repo_size:.2f} MB\n\n".encode("utf-8")
+
+        # Tree section: collect lines in a byte buffer flushed every
+        # 64 KiB, remembering the blobs in display order so their
+        # contents stream right after.
+        blobs = []
+        yield b"Directory Structure:\n```\n"
+        buf = bytearray(_BRANCH)
+        buf += repo_name.encode("utf-8", "surrogateescape")
+        buf += b"/\n"
+        total_lines += 1
+        for line, blob_info in iter_tree(build_tree(entries)):
+            buf += line
+            if blob_info is not None:
+                blobs.append(blob_info)
+            total_lines += 1
+            if len(buf) >= _TREE_FLUSH_SIZE:
+                total_chars += len(buf)
+                yield bytes(buf)
+                buf.clear()
+        total_chars += len(buf)
+        yield bytes(buf)
+        yield b"```\n"
+
+        # Contents come from one long-lived cat-file --batch process:
+        # a pipe write per blob instead of open/stat/read/close on a
+        # checkout, with decompression amortized inside git. Requests
+        # are pipelined a batch at a time, so the pipe never backs up
+        # and memory stays bounded by the batch.
+        proc = await asyncio.create_subprocess_exec(
+            "git", "-C", mirror, "cat-file", "--batch",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            for start in range(0, len(blobs), READ_BATCH_SIZE):
+                batch = blobs[start:start + READ_BATCH_SIZE]
+                wanted = [sha for _, sha, _, reason in batch if reason is None]
+                if wanted:
+                    proc.stdin.write("".join(f"{sha}\n" for sha in wanted).encode("ascii"))
+                    await proc.stdin.drain()
+                for path, sha, size, reason in batch:
+                    if reason is not None:
+                        content = reason
+                    else:
+                        header = await proc.stdout.readline()
+                        fields = header.split()
+                        if len(fields) == 3 and fields[1] == b"blob":
+                            # Body is the blob followed by one LF
+                            body = await proc.stdout.readexactly(int(fields[2]) + 1)
+                            content = body[:-1]
+                            # Catch binaries the extension list missed
+                            if b"\0" in content[:512]:
+                                content = b"[Skipped binary file]"
+                        else:
+                            content = b"[Error reading file: object missing]"
+                            read_errors.append(path)
+                    yield f"\nContents of {path}:\n```\n".encode("utf-8", "surrogateescape")
+                    total_lines += content.count(b"\n")
+                    total_chars += len(content)
+                    yield content
+                    yield b"\n```\n"
+        finally:
+            if proc.stdin:
+                proc.stdin.close()
+            try:
+                await asyncio.wait_for(proc.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                proc.kill()
+
+        yield f"\nLines: {total_lines}\nCharacters: {total_chars}\n".encode("utf-8")
+
+    generated = stream()
+    if cache_path:
+        generated = stream_and_cache(generated, cache_path, read_errors)
+    return generated, None
+
+@app.route('/analyze', methods=['GET', 'POST'])
+async def analyze_repo():
+    """Endpoint to analyze a GitHub repository from a URL."""
+    if request.method == 'POST':
+        # Get URL from POST request
+        data = await request.get_json()
+        if not data or 'repo_url' not in data:
+            response = jsonify({'error': 'Missing repo_url parameter'})
+            response.headers.add("Access-Control-Allow-Origin", "*")
+            return response, 400
+        repo_url = data['repo_url']
+    else:
+        # Get URL from query parameter
+        repo_url = request.args.get('repo_url')
+        if not repo_url:
+            response = jsonify({'error': 'Missing repo_url parameter'})
+            response.headers.add("Access-Control-Allow-Origin", "*")
+            return response, 400
+
+    # Validate the URL (basic check)
+    if not repo_url.startswith('https://github.com/'):
+        response = jsonify({'error': 'Invalid GitHub URL'})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 400
+
+    # Reject missing/private repos with one HTTP round trip, before any
+    # git subprocess is spawned
+    if not await probe_repo(repo_url):
+        response = jsonify({'error': 'Repository is unreachable (missing or private)'})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 404
+
+    # First check the repository size
+    repo_size, size_error = await get_repo_size(repo_url)
+
+    if size_error:
+        response = jsonify({'error': size_error})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 400
+
+    # Check if repository is too large
+    if repo_size > 100:
+        response = jsonify({
+            'error': f"Repository size ({repo_size:.2f} MB) exceeds the 100 MB limit",
+            'repo_size': repo_size
+        })
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 413  # 413 Payload Too Large
+
+    # Determine if the client wants a download or JSON response
+    download = request.args.get('download', 'false').lower() == 'true'
+
+    cache_info = await locate_analysis_cache(repo_url)
+    if download and cache_info[1]:
+        # Cache hit for a download: the analysis is a plain file on disk,
+        # so let it be sent without a round trip through Python.
+        cache_path, _ = cache_info
+        repo_name = extract_repo_name_from_url(repo_url)
+        filename = f"{repo_name}_analysis.txt"
+        if ACCEL_REDIRECT_PREFIX:
+            # nginx streams the file itself with zero-copy sendfile
+            response = Response(b"", mimetype='text/plain', headers={
+                'X-Accel-Redirect': f"{ACCEL_REDIRECT_PREFIX}/{os.path.basename(cache_path)}",
+                'Content-Disposition': f'attachment; filename={filename}',
+            })
+        else:
+            # conditional=True serves ranges and lets the server use
+            # its sendfile/wrap_file path where supported
+            response = await send_file(
+                cache_path,
+                mimetype='text/plain',
+                as_attachment=True,
+                attachment_filename=filename,
+                conditional=True,
+            )
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response
+
+    # Generate the repository analysis
+    stream, error = await generate_repo_analysis(repo_url, repo_size, cache_info)
+
+    if error:
+        response = jsonify({'error': f'Error analyzing repository: {error}'})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 500
+
+    if download:
+        # Stream the analysis straight to the client as it is generated
+        repo_name = extract_repo_name_from_url(repo_url)
+        response = Response(
+            stream,
+            mimetype='text/plain',
+            headers={'Content-Disposition': f'attachment; filename={repo_name}_analysis.txt'}
+        )
+    else:
+        # JSON needs the full text in one value, so collect the stream
+        # and decode it once at the end
+        output_text = b"".join([chunk async for chunk in stream]).decode("utf-8", "replace")
+        response = jsonify({
+            'content': output_text,
+            'repo_size': repo_size
+        })
+
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+
+@app.route('/analyze_batch', methods=['POST'])
+async def analyze_batch():
+    """Endpoint to analyze several GitHub repositories in one request.
+
+    The repositories are fetched concurrently, capped by
+    BATCH_CONCURRENCY to stay clear of GitHub rate limits, and the
+    results come back as a tar.gz with one text file per repository
+    (an _error.txt entry for any that failed).
+    """
+    data = await request.get_json()
+    if not data or not isinstance(data.get('repo_urls'), list) or not data['repo_urls']:
+        response = jsonify({'error': 'Missing repo_urls parameter'})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 400
+    repo_urls = data['repo_urls']
+
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def analyze_one(repo_url):
+        async with sem:
+            if not isinstance(repo_url, str) or not repo_url.startswith('https://github.com/'):
+                raise ValueError('Invalid GitHub URL')
+            if not await probe_repo(repo_url):
+                raise ValueError('Repository is unreachable (missing or private)')
+            repo_size, size_error = await get_repo_size(repo_url)
+            if size_error:
+                raise ValueError(size_error)
+            if repo_size > 100:
+                raise ValueError(
+                    f"Repository size ({repo_size:.2f} MB) exceeds the 100 MB limit"
+                )
+            stream, error = await generate_repo_analysis(repo_url, repo_size)
+            if error:
+                raise ValueError(error)
+            return b"".join([chunk async for chunk in stream])
+
+    results = await asyncio.gather(
+        *(analyze_one(url) for url in repo_urls), return_exceptions=True
+    )
+
+    buffer = io.BytesIO()
+    used_names = set()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+        for index, (repo_url, result) in enumerate(zip(repo_urls, results)):
+            name = extract_repo_name_from_url(repo_url) if isinstance(repo_url, str) else 'invalid'
+            if name in used_names:
+                name = f"{name}_{index}"
+            used_names.add(name)
+            if isinstance(result, BaseException):
+                member_name = f"{name}_error.txt"
+                payload = f"Error analyzing {repo_url}: {result}\n".encode("utf-8")
+            else:
+                member_name = f"{name}_analysis.txt"
+                payload = result
+            info = tarfile.TarInfo(member_name)
+            info.size = len(payload)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(payload))
+    buffer.seek(0)
+
+    response = Response(
+        buffer.getvalue(),
+        mimetype='application/gzip',
+        headers={'Content-Disposition': 'attachment; filename=repo_analyses.tar.gz'}
+    )
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+
+# Local development only; production runs under gunicorn with uvicorn
+# workers (see Procfile)
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5000))
+    app.run(host='0.0.0.0', port=port)